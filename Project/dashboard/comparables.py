@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+# Columns identifying the block of sales a query is compared against
+key_columns = ["Code departement", "Code commune", "Code type local"]
+
+
+class ComparablesIndex:
+    """
+    Index of past sales used to find the comparables of a property.
+
+    Sales are sorted once by department, commune and type, so the candidates of a query
+    are a contiguous slice of the arrays. Surface, rooms and date are normalized by their
+    standard deviation and the k nearest sales are found with a partial sort of that slice.
+    """
+
+    def __init__(self, df):
+        """
+        Build the index.
+
+        Parameters:
+            df (pd.DataFrame): Cleaned built properties, only the sales ('Vente') are indexed.
+        """
+        # Other mutations (exchanges, auctions, expropriations) do not reflect a market price
+        df = df[(df["Nature mutation"] == "Vente") & (df["Surface reelle bati"] > 0)].copy()
+        df["Code departement"] = df["Code departement"].astype(str)
+        df["Code commune"] = df["Code commune"].astype(str)
+        df["Code type local"] = df["Code type local"].astype(int)
+        df = df.sort_values(key_columns, kind="stable").reset_index(drop=True)
+
+        # Offsets of each (department, commune, type) block in the sorted arrays
+        sizes = df.groupby(key_columns, sort=False).size()
+        ends = sizes.cumsum().to_numpy()
+        self.blocks = dict(zip(sizes.index, zip(ends - sizes.to_numpy(), ends)))
+
+        self.surface = df["Surface reelle bati"].to_numpy(dtype=float)
+        self.rooms = df["Nombre pieces principales"].to_numpy(dtype=float)
+        self.days = (df["Date mutation"] - pd.Timestamp(0)).dt.days.to_numpy(dtype=float)
+        self.valeur = df["Valeur fonciere"].to_numpy(dtype=float)
+        self.dates = df["Date mutation"].to_numpy()
+
+        # Scales used to normalize each feature, 1 if the feature is constant
+        self.scales = np.array([np.nanstd(self.surface), np.nanstd(self.rooms), np.nanstd(self.days)])
+        self.scales[~(self.scales > 0)] = 1
+
+    def departments(self):
+        """Get the sorted list of indexed departments."""
+        return sorted({key[0] for key in self.blocks})
+
+    def communes(self, department):
+        """Get the sorted list of indexed communes of a department."""
+        return sorted({key[1] for key in self.blocks if key[0] == department})
+
+    def types(self, department, commune):
+        """Get the sorted list of indexed property types of a commune."""
+        return sorted(key[2] for key in self.blocks if key[:2] == (department, commune))
+
+    def query(self, department, commune, type_local, surface, rooms, date=None, k=10):
+        """
+        Find the k past sales most similar to a property.
+
+        Parameters:
+            department (str): Code departement of the property.
+            commune (str): Code commune of the property.
+            type_local (int): Code type local of the property.
+            surface (float): Surface reelle bati of the property.
+            rooms (float): Nombre pieces principales of the property.
+            date (datetime-like or None): Reference date, None to ignore the date.
+            k (int): Number of comparables to return.
+
+        Returns:
+            pd.DataFrame: Comparables sorted by distance, with their price per square meter.
+        """
+        start, end = self.blocks.get((department, commune, type_local), (0, 0))
+        if start == end:
+            return pd.DataFrame(columns=["Date mutation", "Valeur fonciere", "Surface reelle bati",
+                                         "Nombre pieces principales", "Prix_m2", "Distance"])
+
+        distance = ((self.surface[start:end] - surface) / self.scales[0]) ** 2
+        distance += ((self.rooms[start:end] - rooms) / self.scales[1]) ** 2
+        if date is not None:
+            day = (pd.Timestamp(date) - pd.Timestamp(0)).days
+            distance += ((self.days[start:end] - day) / self.scales[2]) ** 2
+        distance = np.nan_to_num(distance, nan=np.inf)
+
+        # Partial sort: only the k nearest sales are ordered
+        k = min(k, end - start)
+        nearest = np.argpartition(distance, k - 1)[:k]
+        nearest = nearest[np.argsort(distance[nearest])]
+        rows = start + nearest
+
+        return pd.DataFrame({
+            "Date mutation": self.dates[rows],
+            "Valeur fonciere": self.valeur[rows],
+            "Surface reelle bati": self.surface[rows],
+            "Nombre pieces principales": self.rooms[rows],
+            "Prix_m2": self.valeur[rows] / self.surface[rows],
+            "Distance": np.sqrt(distance[nearest]),
+        })
+
+
+def price_per_m2_statistics(comparables):
+    """
+    Compute the price per square meter statistics of comparables.
+
+    Parameters:
+        comparables (pd.DataFrame): Comparables as returned by ComparablesIndex.query.
+
+    Returns:
+        dict: Count, mean, median, first and third quartiles of 'Prix_m2'.
+    """
+    prices = comparables["Prix_m2"].to_numpy(dtype=float)
+    if len(prices) == 0:
+        return {"count": 0, "mean": np.nan, "median": np.nan, "q1": np.nan, "q3": np.nan}
+    q1, median, q3 = np.percentile(prices, [25, 50, 75])
+    return {"count": len(prices), "mean": prices.mean(), "median": median, "q1": q1, "q3": q3}
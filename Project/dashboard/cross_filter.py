@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+# Categorical columns that can be used to cross-filter every view
+filter_columns = ["Code departement", "Code type local", "Month", "Nature mutation", "Nature culture"]
+
+
+class CrossFilterIndex:
+    """
+    Bitmap index over the categorical columns of a DataFrame.
+
+    One packed bitmap (1 bit per row) is built for each value of each column, so any
+    combination of filters resolves to a row selection through bitwise OR (values of
+    the same column) and AND (different columns), without scanning the DataFrame again.
+    """
+
+    def __init__(self, df, columns=filter_columns):
+        """
+        Build the bitmaps of the given columns.
+
+        Parameters:
+            df (pd.DataFrame): The DataFrame to index.
+            columns (list): List of categorical columns to index.
+        """
+        self.n_rows = len(df)
+        self.bitmaps = {}
+        for col in columns:
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col], sort=False)
+            self.bitmaps[col] = {
+                value: np.packbits(codes == code)
+                for code, value in enumerate(uniques)
+            }
+
+    def values(self, col):
+        """
+        Get the indexed values of a column.
+
+        Parameters:
+            col (str): Column name.
+
+        Returns:
+            list: Sorted list of the values of the column.
+        """
+        return sorted(self.bitmaps.get(col, {}), key=str)
+
+    def resolve(self, filters):
+        """
+        Resolve a combination of filters to a boolean row mask.
+
+        Parameters:
+            filters (dict): Column name -> list of accepted values. Columns with an
+                empty list (or not indexed) are not filtered.
+
+        Returns:
+            np.ndarray: Boolean mask with one entry per indexed row.
+        """
+        selection = None
+        for col, values in filters.items():
+            if not values or col not in self.bitmaps:
+                continue
+            column_bitmap = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+            for value in values:
+                bitmap = self.bitmaps[col].get(value)
+                if bitmap is not None:
+                    column_bitmap |= bitmap
+            selection = column_bitmap if selection is None else selection & column_bitmap
+
+        if selection is None:
+            return np.ones(self.n_rows, dtype=bool)
+        return np.unpackbits(selection, count=self.n_rows).astype(bool)
+
+
+def apply_cross_filters(df, index, filters):
+    """
+    Select the rows of a DataFrame matching the filters.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame the index was built on (same row order).
+        index (CrossFilterIndex): Bitmap index of df.
+        filters (dict): Column name -> list of accepted values.
+
+    Returns:
+        pd.DataFrame: Filtered DataFrame.
+    """
+    if len(df) != index.n_rows:
+        raise ValueError(f"The index covers {index.n_rows} rows but the DataFrame has {len(df)}, "
+                         "rebuild the index after reloading the data.")
+    if not any(filters.values()):
+        return df
+    return df[index.resolve(filters)]
@@ -5,15 +5,201 @@ import seaborn as sns
 from tensorflow.python.ops.random_ops import categorical
 
 from dashboard.dataset_cleaning import cleaning
-from dashboard.visu_generation import (prepare_data_for_plotting, get_numerical_columns, get_categorical_columns,
+from dashboard.visu_generation import (columns_list, land_columns_list,
+                                       prepare_data_for_plotting, get_numerical_columns, get_categorical_columns,
                                        plot_categorical_distribution, plot_numerical_distribution,
                                        plot_numerical_vs_valeur_fonciere, plot_categorical_vs_valeur_fonciere,
-                                       plot_valeur_fonciere_range)
+                                       plot_valeur_fonciere_range, plot_density, plot_trend, type_local_mapping)
+from dashboard.comparables import ComparablesIndex, price_per_m2_statistics
+from dashboard.trends import TrendStore, trend_frequencies
+from dashboard.cross_filter import CrossFilterIndex, apply_cross_filters, filter_columns
 
 @st.cache_data
 def prepare_data_for_plotting(df, columns_to_plot):
     return df[columns_to_plot]
 
+@st.cache_resource
+def build_cross_filter_indexes(filepath):
+    """
+    Build the bitmap cross-filter index of each cleaned dataset once.
+
+    Parameters:
+        filepath (str): Path to the data file.
+
+    Returns:
+        tuple: (index_built, index_land, index_all)
+    """
+    df_built, df_land, df = cleaning(filepath)
+    return CrossFilterIndex(df_built), CrossFilterIndex(df_land), CrossFilterIndex(df)
+
+@st.cache_resource
+def build_comparables_index(filepath):
+    """
+    Build the comparable-sales index of the cleaned built properties once.
+
+    Parameters:
+        filepath (str): Path to the data file.
+
+    Returns:
+        ComparablesIndex: Index of the built properties.
+    """
+    df_built, df_land, df = cleaning(filepath)
+    return ComparablesIndex(df_built)
+
+def display_comparables(index, filters):
+    """Display the comparable-sales lookup for a property entered by the user."""
+    st.header("Comparable Sales")
+    st.caption("Only the Code departement and Code type local filters apply to this section.")
+
+    departments = restrict_to_filter(index.departments(), filters['Code departement'], str)
+    if not departments:
+        st.write("No data available for the selected filters.")
+        return
+
+    # Step 1: User describes the property
+    col1, col2 = st.columns(2)
+    with col1:
+        department = st.selectbox('Code Departement', departments)
+        commune = st.selectbox('Code Commune', index.communes(department))
+        type_local = st.selectbox('Type', restrict_to_filter(index.types(department, commune),
+                                                             filters['Code type local'], int),
+                                  format_func=lambda x: type_local_mapping.get(x, str(x)))
+    with col2:
+        surface = st.number_input('Surface Reelle Bati (m²)', min_value=1.0, value=70.0)
+        rooms = st.number_input('Nombre Pieces Principales', min_value=0, value=3)
+        use_date = st.checkbox('Take the sale date into account')
+        date = st.date_input('Date') if use_date else None
+    k = st.slider('Number of comparables', 1, 50, 10)
+
+    # Step 2: Lookup of the nearest past sales
+    comparables = index.query(department, commune, type_local, surface, rooms, date, k)
+    if comparables.empty:
+        st.write("No past sale available for this commune and type.")
+        return
+
+    stats = price_per_m2_statistics(comparables)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Median Prix m²", f"{stats['median']:,.0f} €")
+    col2.metric("Mean Prix m²", f"{stats['mean']:,.0f} €")
+    col3.metric("Q1 Prix m²", f"{stats['q1']:,.0f} €")
+    col4.metric("Q3 Prix m²", f"{stats['q3']:,.0f} €")
+    st.write(f"Estimated value: {stats['median'] * surface:,.0f} €")
+    st.dataframe(comparables)
+
+@st.cache_resource
+def build_trend_stores(filepath):
+    """
+    Precompute the price per square meter trends of the cleaned built properties once.
+
+    Parameters:
+        filepath (str): Path to the data file.
+
+    Returns:
+        dict: Frequency name -> TrendStore.
+    """
+    df_built, df_land, df = cleaning(filepath)
+    return {frequency: TrendStore(df_built, frequency) for frequency in trend_frequencies}
+
+@st.cache_data
+def build_trends_csv(filepath, frequency):
+    """
+    Build the CSV export of every trend of a frequency once.
+
+    Parameters:
+        filepath (str): Path to the data file.
+        frequency (str): Key of trend_frequencies.
+
+    Returns:
+        str: CSV content.
+    """
+    return build_trend_stores(filepath)[frequency].to_frame().to_csv(index=False)
+
+def display_trends(filepath, filters):
+    """Display the price per square meter trend of a department and type, and the export of all trends."""
+    st.header("Prix m² Trends")
+    st.caption("Trends only cover sales ('Vente'). Only the Code departement, Code type local "
+               "and Nature mutation filters apply to this section.")
+
+    if filters['Nature mutation'] and 'Vente' not in filters['Nature mutation']:
+        st.write("No data available for the selected filters.")
+        return
+
+    frequency = st.radio("Frequency", options=list(trend_frequencies), horizontal=True)
+    store = build_trend_stores(filepath)[frequency]
+
+    departments = restrict_to_filter(store.departments(), filters['Code departement'], str)
+    if not departments:
+        st.write("No data available for the selected filters.")
+        return
+    department = st.selectbox('Select Code Departement', departments)
+
+    types = restrict_to_filter(store.types(department), filters['Code type local'], int)
+    if not types:
+        st.write(f"No data available for Code Departement {department} with the selected types.")
+        return
+    type_local = st.selectbox('Select Type', types,
+                              format_func=lambda x: type_local_mapping.get(x, str(x)))
+    type_label = type_local_mapping.get(type_local, str(type_local))
+    plot_trend(store.series(department, type_local), department, type_label)
+
+    # Export of every series of the selected frequency
+    st.download_button(
+        label=f"Download all {frequency.lower()} trends as CSV",
+        data=build_trends_csv(filepath, frequency),
+        file_name=f"trends_{frequency.lower()}.csv",
+        mime="text/csv",
+    )
+
+def select_range(label, min_value, max_value):
+    """
+    Display a range slider over the given bounds.
+
+    Parameters:
+        label (str): Label of the slider.
+        min_value: Lower bound of the slider.
+        max_value: Upper bound of the slider.
+
+    Returns:
+        tuple or None: Selected (min, max), None if the bounds are equal since
+            st.slider rejects them (e.g. a department with a single sale).
+    """
+    if min_value == max_value:
+        return None
+    return st.slider(label, min_value, max_value, (min_value, max_value))
+
+def restrict_to_filter(options, selected, cast):
+    """
+    Keep the options allowed by a sidebar cross-filter.
+
+    Parameters:
+        options (list): Options of a selectbox.
+        selected (list): Values selected in the filter, all options are kept if empty.
+        cast (type): Type the filter values are converted to, to match the options.
+
+    Returns:
+        list: Allowed options.
+    """
+    if not selected:
+        return options
+    allowed = {cast(value) for value in selected}
+    return [option for option in options if option in allowed]
+
+def select_cross_filters(index):
+    """
+    Display one multiselect per filter column in the sidebar.
+
+    Parameters:
+        index (CrossFilterIndex): Index providing the values of each column.
+
+    Returns:
+        dict: Column name -> list of selected values.
+    """
+    st.sidebar.header("Filters")
+    return {
+        col: st.sidebar.multiselect(col, options=index.values(col))
+        for col in filter_columns
+    }
+
 def create_plot_options(cols):
     """
     Create a dictionary with column names as keys and False as values
@@ -125,13 +311,7 @@ def display_cv():
 def main(filepath):
     #get the dataset
     df_built, df_land, df = cleaning(filepath)
-    # Define the columns to keep for plotting
-    columns_list = [
-        "Month", "Nature mutation", "Valeur fonciere",
-        "Code departement", "Code type local", "Surface reelle bati",
-        "Surface terrain", "Nombre pieces principales", "Nature culture"
-    ]
-
+    index_built, index_land, index_all = build_cross_filter_indexes(filepath)
     # Prepare the subset of the dataframe
     df_subset = prepare_data_for_plotting(df, columns_list)
     df_built_subset = prepare_data_for_plotting(df_built, columns_list)
@@ -141,8 +321,17 @@ def main(filepath):
     st.sidebar.title("Navigation")
     section_choice = st.sidebar.radio(
         "Select View",
-        options=["See Resume","Data Cleaning Results", "Data Analysis (Plots)", "Valeur Foncière Range Analysis"]
+        options=["See Resume","Data Cleaning Results", "Data Analysis (Plots)", "Valeur Foncière Range Analysis",
+                 "Surface vs Price Density", "Comparable Sales",
+                 "Prix m² Trends"]
     )
+
+    # Sidebar: Filters shared by every view, resolved through the bitmap indexes
+    filters = select_cross_filters(index_all)
+    df_subset = apply_cross_filters(df_subset, index_all, filters)
+    df_built_subset = apply_cross_filters(df_built_subset, index_built, filters)
+    df_land_subset = apply_cross_filters(df_land_subset, index_land, filters)
+
     if section_choice == "See Resume":
         display_cv()
     elif section_choice == "Data Cleaning Results":
@@ -164,8 +353,7 @@ def main(filepath):
 
         filtered_columns_list=columns_list
         if dataset_choice == "Land Properties":
-            filtered_columns_list = [col for col in columns_list if col in[ "Month", "Nature mutation", "Valeur fonciere",
-            "Code departement", "Code type local", "Surface terrain", "Nature culture"]]
+            filtered_columns_list = land_columns_list
 
         # Get numerical and categorical columns for the selected dataset
         numerical_cols = get_numerical_columns(selected_df)
@@ -218,20 +406,52 @@ def main(filepath):
         df_built_subset['Code departement'] = df_built_subset['Code departement'].astype(str)
         df_built_subset=df_built_subset[df_built_subset['Nature mutation']=='Vente']
 
-        # Step 1: User selects the department
-        department_list = df_built_subset['Code departement'].unique()
-        selected_department = st.selectbox('Select Code Departement', sorted(department_list))
-
-        # Step 2: User selects a range of 'Valeur fonciere'
-        min_valeur = df_built_subset['Valeur fonciere'].min()
-        max_valeur = df_built_subset['Valeur fonciere'].max()
-        selected_range = st.slider('Select range of Valeur Foncière',
-                                   min_valeur, max_valeur, (min_valeur, max_valeur))
-        plot_valeur_fonciere_range(df_built_subset, selected_department, selected_range)
+        if df_built_subset.empty:
+            st.write("No data available for the selected filters.")
+        else:
+            # Step 1: User selects the department
+            department_list = df_built_subset['Code departement'].unique()
+            selected_department = st.selectbox('Select Code Departement', sorted(department_list))
+
+            # Step 2: User selects a range of 'Valeur fonciere'
+            min_valeur = df_built_subset['Valeur fonciere'].min()
+            max_valeur = df_built_subset['Valeur fonciere'].max()
+            selected_range = select_range('Select range of Valeur Foncière', min_valeur, max_valeur)
+            if selected_range is None:
+                selected_range = (min_valeur, max_valeur)
+            plot_valeur_fonciere_range(df_built_subset, selected_department, selected_range)
+
+    elif section_choice == "Surface vs Price Density":
+        st.header("Surface Reelle Bati vs Valeur Foncière Density")
+
+        department_list = df_built_subset['Code departement'].astype(str).unique()
+        if len(department_list) == 0:
+            st.write("No data available for the selected filters.")
+        else:
+            selected_department = st.selectbox('Select Code Departement', sorted(department_list))
+            department_df = df_built_subset[df_built_subset['Code departement'].astype(str) == selected_department]
+
+            # Zooming and panning through the sliders re-aggregates the grid on the selected window
+            min_surface = float(department_df['Surface reelle bati'].min())
+            max_surface = float(department_df['Surface reelle bati'].max())
+            min_valeur = float(department_df['Valeur fonciere'].min())
+            max_valeur = float(department_df['Valeur fonciere'].max())
+            x_range = select_range('Surface Reelle Bati window', min_surface, max_surface)
+            y_range = select_range('Valeur Foncière window', min_valeur, max_valeur)
+            log_scale = st.checkbox('Log scale', value=True)
+            plot_density(department_df, selected_department, x_range, y_range, log_scale)
+
+    elif section_choice == "Comparable Sales":
+        display_comparables(build_comparables_index(filepath), filters)
+
+    elif section_choice == "Prix m² Trends":
+        display_trends(filepath, filters)
 
     # Button to clear the cache
     if st.sidebar.button("Clear Cache"):
         st.cache_data.clear()
+        # The cross-filter indexes, comparables index and trend stores are built from the cleaned data too
+        st.cache_resource.clear()
         st.success("Cache cleared successfully!")
 if __name__ == "__main__":
     main()
@@ -1,3 +1,6 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
 import pandas as pd
 import streamlit as st
 
@@ -109,24 +112,87 @@ def merge_similar_lines(df):
     }).reset_index()
     return df
 
-def remove_outliers(df, column, multiplier=3):
+def _iqr_bounds(values, multiplier=3):
+    """
+    Compute the IQR bounds of a column over all its values.
+
+    Parameters:
+        values (pd.Series): Values to compute the bounds of.
+        multiplier (int): Multiplier for the IQR to define bounds.
+
+    Returns:
+        tuple: (lower_bound, upper_bound)
+    """
+    Q1 = values.quantile(0.25)
+    Q3 = values.quantile(0.75)
+    IQR = Q3 - Q1
+    return Q1 - multiplier * IQR, Q3 + multiplier * IQR
+
+def _iqr_outlier_mask(df, column, multiplier=3, group_cols=None, global_bounds=None):
+    """
+    Build a boolean mask of the rows lying inside the IQR bounds of a column.
+
+    When group_cols is given, the quartiles of every group are computed in a single
+    groupby pass and broadcast back to the rows, so each row is compared to the bounds
+    of its own group. Groups whose IQR is 0 (more than 75% of equal values) would reject
+    every other value, so they fall back to the global bounds.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame to process.
+        column (str): Column name to check for outliers.
+        multiplier (int): Multiplier for the IQR to define bounds.
+        group_cols (list or None): Columns defining the groups, None for global bounds.
+        global_bounds (tuple or None): (lower_bound, upper_bound) used for groups with a
+            null IQR, computed from df if None.
+
+    Returns:
+        pd.Series: Boolean mask aligned on df, True for rows to keep.
+    """
+    if global_bounds is None:
+        global_bounds = _iqr_bounds(df[column], multiplier)
+    if group_cols is None:
+        lower_bound, upper_bound = global_bounds
+    else:
+        grouped = df.groupby(group_cols, sort=False, dropna=False)[column]
+        Q1 = grouped.transform('quantile', q=0.25)
+        Q3 = grouped.transform('quantile', q=0.75)
+        IQR = Q3 - Q1
+        lower_bound = (Q1 - multiplier * IQR).where(IQR > 0, global_bounds[0])
+        upper_bound = (Q3 + multiplier * IQR).where(IQR > 0, global_bounds[1])
+    return (df[column] >= lower_bound) & (df[column] <= upper_bound)
+
+def remove_outliers(df, column, multiplier=3, group_cols=None, n_jobs=1):
     """
     Remove outliers from a DataFrame column using the IQR method.
 
+    Bounds are computed over the whole column by default. Passing group_cols
+    (e.g. ['Code departement'] or ['Code departement', 'Code type local']) computes
+    them per group instead, so Paris sales are not judged against rural prices.
+    Groups with a null IQR use the bounds of the whole column.
+
     Parameters:
         df (pd.DataFrame): The DataFrame to process.
         column (str): Column name to remove outliers from.
         multiplier (int): Multiplier for the IQR to define bounds.
+        group_cols (list or None): Columns defining the groups, None for global bounds.
+        n_jobs (int): Number of processes used to compute grouped bounds, only
+            worth raising above 1 for very large inputs.
 
     Returns:
         pd.DataFrame: DataFrame without outliers in the specified column.
     """
-    Q1 = df[column].quantile(0.25)
-    Q3 = df[column].quantile(0.75)
-    IQR = Q3 - Q1
-    lower_bound = Q1 - multiplier * IQR
-    upper_bound = Q3 + multiplier * IQR
-    df = df[(df[column] >= lower_bound) & (df[column] <= upper_bound)]
+    global_bounds = _iqr_bounds(df[column], multiplier)
+    if group_cols is None or n_jobs <= 1:
+        mask = _iqr_outlier_mask(df, column, multiplier, group_cols, global_bounds)
+    else:
+        # Groups are independent, so whole groups are dealt to the workers
+        group_ids = df.groupby(group_cols, sort=False, dropna=False).ngroup()
+        chunks = [df[group_ids % n_jobs == i] for i in range(n_jobs)]
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            masks = executor.map(_iqr_outlier_mask, chunks, repeat(column),
+                                 repeat(multiplier), repeat(group_cols), repeat(global_bounds))
+            mask = pd.concat(list(masks)).reindex(df.index)
+    df = df[mask]
     return df
 
 def separate_datasets(df):
@@ -175,7 +241,11 @@ def cleaning(filepath):
 
     df = add_month_colum(df)
 
-    # Remove outliers in 'Surface terrain'
+    # Outlier bounds are computed per area since prices differ a lot between departments
+    department = ['Code departement']
+    department_type = ['Code departement', 'Code type local']
+
+    # Remove outliers in 'Surface terrain', bounds kept national since most urban sales have no land
     df_process = remove_outliers(df, "Surface terrain", multiplier=3)
 
     df_process= df_process[df_process["Code type local"] > 0]
@@ -183,13 +253,13 @@ def cleaning(filepath):
     # Separate into built and land-only datasets
     df_built, df_land = separate_datasets(df_process)
 
-    # Remove outliers in 'Surface reelle bati' for built properties
-    df_built = remove_outliers(df_built, "Surface reelle bati", multiplier=3)
+    # Remove outliers in 'Surface reelle bati' for built properties, per department and type
+    df_built = remove_outliers(df_built, "Surface reelle bati", multiplier=3, group_cols=department_type)
 
-    # Remove outliers in 'Valeur fonciere' for built properties
-    df_built = remove_outliers(df_built, "Valeur fonciere", multiplier=3)
+    # Remove outliers in 'Valeur fonciere' for built properties, per department and type
+    df_built = remove_outliers(df_built, "Valeur fonciere", multiplier=3, group_cols=department_type)
 
-    # Remove outliers in 'Valeur fonciere' for land-only properties
-    df_land = remove_outliers(df_land, "Valeur fonciere", multiplier=3)
+    # Remove outliers in 'Valeur fonciere' for land-only properties, per department
+    df_land = remove_outliers(df_land, "Valeur fonciere", multiplier=3, group_cols=department)
 
     return df_built, df_land,df
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Trend frequencies: pandas offset, rolling window and number of periods in a year
+trend_frequencies = {
+    "Weekly": ("W-MON", 4, 52),
+    "Monthly": ("MS", 3, 12),
+}
+
+
+class TrendStore:
+    """
+    Precomputed median sale price per square meter series per department and type.
+
+    The medians of every (department, type) are computed in one groupby pass and kept as
+    compact 2D arrays (periods x series) along with their rolling median and year-over-year
+    delta, so a trend is served by slicing a column instead of recomputing it from the rows.
+    """
+
+    def __init__(self, df, frequency="Monthly"):
+        """
+        Compute the series.
+
+        Parameters:
+            df (pd.DataFrame): Cleaned built properties, only the sales ('Vente') are used.
+            frequency (str): Key of trend_frequencies.
+        """
+        freq, window, periods_per_year = trend_frequencies[frequency]
+        self.frequency = frequency
+
+        # Other mutations (exchanges, auctions, expropriations) do not reflect a market price
+        df = df[(df["Nature mutation"] == "Vente") & (df["Surface reelle bati"] > 0) & df["Date mutation"].notna()]
+        df = pd.DataFrame({
+            "Code departement": df["Code departement"].astype(str),
+            "Code type local": df["Code type local"].astype(int),
+            "Date mutation": df["Date mutation"],
+            "Prix_m2": df["Valeur fonciere"] / df["Surface reelle bati"],
+        })
+        medians = df.groupby(["Code departement", "Code type local",
+                              pd.Grouper(key="Date mutation", freq=freq)])["Prix_m2"].median()
+
+        # One column per (department, type), one row per period without gaps
+        wide = medians.unstack(["Code departement", "Code type local"]).asfreq(freq)
+        rolling = wide.rolling(window, min_periods=1).median()
+        yoy = wide / wide.shift(periods_per_year) - 1
+
+        self.periods = wide.index.to_numpy()
+        self.columns = {key: position for position, key in enumerate(wide.columns)}
+        self.median = wide.to_numpy(dtype=np.float32)
+        self.rolling = rolling.to_numpy(dtype=np.float32)
+        self.yoy = yoy.to_numpy(dtype=np.float32)
+
+    def departments(self):
+        """Get the sorted list of departments with a series."""
+        return sorted({key[0] for key in self.columns})
+
+    def types(self, department):
+        """Get the sorted list of property types with a series in a department."""
+        return sorted(key[1] for key in self.columns if key[0] == department)
+
+    def series(self, department, type_local):
+        """
+        Get the trend of a department and property type.
+
+        Parameters:
+            department (str): Code departement.
+            type_local (int): Code type local.
+
+        Returns:
+            pd.DataFrame: Median, rolling median and year-over-year delta per period.
+        """
+        position = self.columns[(department, type_local)]
+        return pd.DataFrame({
+            "Date": self.periods,
+            "Median Prix_m2": self.median[:, position],
+            "Rolling Median Prix_m2": self.rolling[:, position],
+            "YoY Delta": self.yoy[:, position],
+        })
+
+    def to_frame(self):
+        """
+        Get every series in long format, for export.
+
+        Returns:
+            pd.DataFrame: One row per department, type and period with a median.
+        """
+        keys = list(self.columns)
+        n_periods, n_series = self.median.shape
+        df = pd.DataFrame({
+            "Code departement": np.tile([key[0] for key in keys], n_periods),
+            "Code type local": np.tile([key[1] for key in keys], n_periods),
+            "Date": np.repeat(self.periods, n_series),
+            "Median Prix_m2": self.median.ravel(),
+            "Rolling Median Prix_m2": self.rolling.ravel(),
+            "YoY Delta": self.yoy.ravel(),
+        })
+        return df[df["Median Prix_m2"].notna()].reset_index(drop=True)
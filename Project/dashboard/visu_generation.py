@@ -1,9 +1,11 @@
+import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 from tensorflow.python.ops.random_ops import categorical
 import streamlit as st
 import plotly.express as px
+import plotly.graph_objects as go
 import geopandas as gpd
 import geoviews as gv
 from geoviews import dim
@@ -15,6 +17,17 @@ import plotly.express as px
 import streamlit as st
 gv.extension('bokeh')
 
+# Columns to keep for plotting
+columns_list = [
+    "Month", "Nature mutation", "Valeur fonciere",
+    "Code departement", "Code type local", "Surface reelle bati",
+    "Surface terrain", "Nombre pieces principales", "Nature culture"
+]
+
+# Columns meaningful for land-only properties
+land_columns_list = [col for col in columns_list if col in[ "Month", "Nature mutation", "Valeur fonciere",
+                     "Code departement", "Code type local", "Surface terrain", "Nature culture"]]
+
 def prepare_data_for_plotting(df, columns_to_plot):
     """
     Subset the DataFrame and keep only the desired columns for plotting.
@@ -75,10 +88,8 @@ type_local_mapping = {
     4: 'Local'
 }
 
-def plot_numerical_distribution(df, col):
-    """Plot interactive distribution for the selected numerical column."""
-    print(f"Interactive numerical Distribution of {col}")
-
+def make_numerical_distribution_figure(df, col):
+    """Build the interactive distribution figure of a numerical column."""
     # Create an interactive histogram using Plotly
     fig = px.histogram(
         df,
@@ -98,16 +109,19 @@ def plot_numerical_distribution(df, col):
         bargap=0.1,  # Adjust gap between bars
         hovermode="x unified"  # Make hover info consistent
     )
+    return fig
+
+def plot_numerical_distribution(df, col):
+    """Plot interactive distribution for the selected numerical column."""
+    print(f"Interactive numerical Distribution of {col}")
 
     # Display the plot using Streamlit
-    st.plotly_chart(fig)
+    st.plotly_chart(make_numerical_distribution_figure(df, col))
 
 
 
-def plot_categorical_distribution(df, col):
-    """Plot interactive distribution for the selected categorical column."""
-    print(f"Interactive categorical Distribution of {col}")
-
+def make_categorical_distribution_figure(df, col):
+    """Build the interactive distribution figure of a categorical column."""
     if col.lower() == 'code type local':
         # Convert 'Code type local' to integer to ensure consistency
         df[col] = df[col].astype(float).astype('Int64')
@@ -150,15 +164,18 @@ def plot_categorical_distribution(df, col):
         hovermode="x unified",  # Make hover info consistent
         bargap=0.1  # Adjust the gap between bars
     )
+    return fig
+
+def plot_categorical_distribution(df, col):
+    """Plot interactive distribution for the selected categorical column."""
+    print(f"Interactive categorical Distribution of {col}")
 
     # Display the plot using Streamlit
-    st.plotly_chart(fig)
+    st.plotly_chart(make_categorical_distribution_figure(df, col))
 
 
-def plot_numerical_vs_valeur_fonciere(df, col):
-    """Plot interactive line plot for mean Valeur Foncière for values of a numerical variable."""
-    st.write(f"Mean Valeur Foncière across {col}")
-
+def make_numerical_vs_valeur_fonciere_figure(df, col):
+    """Build the line figure of mean Valeur Foncière for values of a numerical variable."""
     # Calculate mean Valeur Foncière for each unique value in the numerical variable
     mean_valeur_fonciere = df.groupby(col)['Valeur fonciere'].mean().reset_index()
 
@@ -181,84 +198,100 @@ def plot_numerical_vs_valeur_fonciere(df, col):
         yaxis_title='Mean Valeur Foncière',
         hovermode='x unified'  # Show hover info for all data points along the x-axis
     )
+    return fig
+
+def plot_numerical_vs_valeur_fonciere(df, col):
+    """Plot interactive line plot for mean Valeur Foncière for values of a numerical variable."""
+    st.write(f"Mean Valeur Foncière across {col}")
 
     # Display the plot in Streamlit
-    st.plotly_chart(fig)
+    st.plotly_chart(make_numerical_vs_valeur_fonciere_figure(df, col))
+
+def make_department_map(df):
+    """Build the folium map of the median price per square meter by department."""
+    df['Code departement'] = df['Code departement'].astype(str)
+
+    # Calculate mean price per square meter for each department
+    df['Prix_m2'] = df['Valeur fonciere'] / df['Surface reelle bati']
+    avg_price_per_department = df.groupby('Code departement')['Prix_m2'].median().reset_index()
+
+    # Use pyogrio to load the GeoJSON data
+    sf = gpd.GeoDataFrame.from_features(pyogrio.read_dataframe('data/france-geojson/departements-version-simplifiee.geojson'))
+
+    # Ensure proper formatting of department codes (e.g., padding with zeros if necessary)
+    sf['code'] = sf['code'].astype(str).apply(lambda x: x.zfill(2) if x.isdigit() else x)
+    avg_price_per_department['Code departement'] = avg_price_per_department['Code departement'].astype(str).apply(lambda x: x.zfill(2) if x.isdigit() else x)
+
+    # Merge the GeoDataFrame with the price data
+    df_merged = pd.merge(sf, avg_price_per_department[['Code departement', 'Prix_m2']], left_on='code', right_on='Code departement', how='left')
+
+    # Check if the CRS is set; if not, set it to a default CRS (for example, 'EPSG:4326')
+    if df_merged.crs is None:
+        df_merged.set_crs(epsg=4326, inplace=True)  # Assuming the original data is in WGS84 (EPSG:4326)
+
+    # Ensure the GeoDataFrame is in the WGS84 projection (EPSG:4326) for folium compatibility
+    df_merged = df_merged.to_crs(epsg=4326)
+
+    # Initialize a folium map centered on France
+    m = folium.Map(location=[46.603354, 1.888334], zoom_start=6)
+
+    # Add the GeoJSON layer to the folium map
+    folium.Choropleth(
+        geo_data=df_merged,
+        name='choropleth',
+        data=df_merged,
+        columns=['code', 'Prix_m2'],
+        key_on='feature.properties.code',  # Match with 'code' field in GeoJSON
+        fill_color='YlGnBu',
+        fill_opacity=0.7,
+        line_opacity=0.2,
+        legend_name='Prix moyen par mètre carré',
+    ).add_to(m)
+    return m
+
+def make_categorical_vs_valeur_fonciere_figure(df, col):
+    """Build the bar figure of mean Valeur Foncière for categories of a categorical variable."""
+    df[col] = df[col].astype(str)
+    mean_valeur_fonciere = df.groupby(col)['Valeur fonciere'].mean().reset_index()
+
+    # Create an interactive bar plot using Plotly
+    fig = px.bar(
+        mean_valeur_fonciere,
+        x=col,
+        y='Valeur fonciere',
+        title=f"Mean Valeur Foncière for {col}",
+        labels={col: col, 'Valeur fonciere': 'Mean Valeur Foncière'}
+    )
+    if col.lower() == 'code type local':
+        fig.update_xaxes(tickvals=list(type_local_mapping.keys()), ticktext=list(type_local_mapping.values()))
+    # Customize layout
+    fig.update_layout(
+        xaxis_title=col,
+        yaxis_title='Mean Valeur Foncière',
+        hovermode='x unified',  # Show hover info for all data points along the x-axis
+        xaxis={'categoryorder': 'total descending'}  # Order bars by descending frequency
+    )
+    return fig
 
 def plot_categorical_vs_valeur_fonciere(df, col):
     """Plot interactive map for 'Code departement' or a bar plot for other categorical variables."""
     st.write(f"Mean Valeur Foncière across categories of {col}")
-    df[col] = df[col].astype(str)
 
     # Special case for "Code departement" to display the map
     if col == 'Code departement':
-        # Calculate mean price per square meter for each department
-        df['Prix_m2'] = df['Valeur fonciere'] / df['Surface reelle bati']
-        avg_price_per_department = df.groupby('Code departement')['Prix_m2'].median().reset_index()
-
-        # Use pyogrio to load the GeoJSON data
-        sf = gpd.GeoDataFrame.from_features(pyogrio.read_dataframe('data/france-geojson/departements-version-simplifiee.geojson'))
-
-        # Ensure proper formatting of department codes (e.g., padding with zeros if necessary)
-        sf['code'] = sf['code'].astype(str).apply(lambda x: x.zfill(2) if x.isdigit() else x)
-        avg_price_per_department['Code departement'] = avg_price_per_department['Code departement'].astype(str).apply(lambda x: x.zfill(2) if x.isdigit() else x)
-
-        # Merge the GeoDataFrame with the price data
-        df_merged = pd.merge(sf, avg_price_per_department[['Code departement', 'Prix_m2']], left_on='code', right_on='Code departement', how='left')
-
-        # Check if the CRS is set; if not, set it to a default CRS (for example, 'EPSG:4326')
-        if df_merged.crs is None:
-            df_merged.set_crs(epsg=4326, inplace=True)  # Assuming the original data is in WGS84 (EPSG:4326)
-
-        # Ensure the GeoDataFrame is in the WGS84 projection (EPSG:4326) for folium compatibility
-        df_merged = df_merged.to_crs(epsg=4326)
-
-        # Initialize a folium map centered on France
-        m = folium.Map(location=[46.603354, 1.888334], zoom_start=6)
-
-        # Add the GeoJSON layer to the folium map
-        folium.Choropleth(
-            geo_data=df_merged,
-            name='choropleth',
-            data=df_merged,
-            columns=['code', 'Prix_m2'],
-            key_on='feature.properties.code',  # Match with 'code' field in GeoJSON
-            fill_color='YlGnBu',
-            fill_opacity=0.7,
-            line_opacity=0.2,
-            legend_name='Prix moyen par mètre carré',
-        ).add_to(m)
-
         # Display the map in Streamlit
         st.write("Interactive map showing average price per square meter by department:")
-        st_folium(m, width=700, height=500)
+        st_folium(make_department_map(df), width=700, height=500)
 
     else:
         # For other categorical variables, create a bar plot
-        mean_valeur_fonciere = df.groupby(col)['Valeur fonciere'].mean().reset_index()
-
-        # Create an interactive bar plot using Plotly
-        fig = px.bar(
-            mean_valeur_fonciere,
-            x=col,
-            y='Valeur fonciere',
-            title=f"Mean Valeur Foncière for {col}",
-            labels={col: col, 'Valeur fonciere': 'Mean Valeur Foncière'}
-        )
-        if col.lower() == 'code type local':
-            fig.update_xaxes(tickvals=list(type_local_mapping.keys()), ticktext=list(type_local_mapping.values()))
-        # Customize layout
-        fig.update_layout(
-            xaxis_title=col,
-            yaxis_title='Mean Valeur Foncière',
-            hovermode='x unified',  # Show hover info for all data points along the x-axis
-            xaxis={'categoryorder': 'total descending'}  # Order bars by descending frequency
-        )
-
         # Display the plot in Streamlit
-        st.plotly_chart(fig)
-def plot_valeur_fonciere_range(df, selected_department, selected_range):
-    """Plot number of properties for each value of 'Surface reelle bati' and 'Code type local' in a selected range of Valeur Foncière."""
+        st.plotly_chart(make_categorical_vs_valeur_fonciere_figure(df, col))
+def make_valeur_fonciere_range_figure(df, selected_department, selected_range):
+    """
+    Build the bar figure of the number of properties for each value of 'Surface reelle bati' and
+    'Code type local' in a selected range of Valeur Foncière. Returns None if no property matches.
+    """
 
     # Filter the data based on selected department and valeur foncière range
     filtered_df = df[
@@ -267,27 +300,134 @@ def plot_valeur_fonciere_range(df, selected_department, selected_range):
         (df['Valeur fonciere'] <= selected_range[1])
     ]
 
+    if filtered_df.empty:
+        return None
+
     filtered_df['Code type local'] = filtered_df['Code type local'].map(type_local_mapping)
 
     # Count the number of properties for each value of 'Surface reelle bati' and 'Code type local'
-    if not filtered_df.empty:
-        # Group by both 'Surface reelle bati' and 'Code type local'
-        surface_bati_distribution = filtered_df.groupby(['Surface reelle bati', 'Code type local']).size().reset_index(name='Count')
-        color_sequence = ['#ff0000', '#0000ff', '#00ff00', '#800080']
-        # Create a bar plot using Plotly, color-coded by 'Code type local'
-        fig = px.bar(
-            surface_bati_distribution,
-            x='Surface reelle bati',
-            y='Count',
-            color='Code type local',  # This ensures that each 'Code type local' gets a separate color
-            title=f"Distribution of Surface Reelle Bati by Code Type Local in {selected_department} for Valeur Foncière Range {selected_range}",
-            labels={'Surface reelle bati': 'Surface Reelle Bati (m²)', 'Count': 'Number of Properties', 'Code type local': 'Type'},
-            text='Count',
-            color_discrete_sequence = color_sequence
-        )
+    # Group by both 'Surface reelle bati' and 'Code type local'
+    surface_bati_distribution = filtered_df.groupby(['Surface reelle bati', 'Code type local']).size().reset_index(name='Count')
+    color_sequence = ['#ff0000', '#0000ff', '#00ff00', '#800080']
+    # Create a bar plot using Plotly, color-coded by 'Code type local'
+    fig = px.bar(
+        surface_bati_distribution,
+        x='Surface reelle bati',
+        y='Count',
+        color='Code type local',  # This ensures that each 'Code type local' gets a separate color
+        title=f"Distribution of Surface Reelle Bati by Code Type Local in {selected_department} for Valeur Foncière Range {selected_range}",
+        labels={'Surface reelle bati': 'Surface Reelle Bati (m²)', 'Count': 'Number of Properties', 'Code type local': 'Type'},
+        text='Count',
+        color_discrete_sequence = color_sequence
+    )
+    return fig
 
+def plot_valeur_fonciere_range(df, selected_department, selected_range):
+    """Plot number of properties for each value of 'Surface reelle bati' and 'Code type local' in a selected range of Valeur Foncière."""
+    fig = make_valeur_fonciere_range_figure(df, selected_department, selected_range)
+
+    if fig is not None:
         # Display the bar plot in Streamlit
         st.plotly_chart(fig)
 
     else:
-        st.write(f"No data available for Code Departement {selected_department} in the selected range.")
\ No newline at end of file
+        st.write(f"No data available for Code Departement {selected_department} in the selected range.")
+
+
+def aggregate_density(x, y, x_range, y_range, width=300, height=200, log_scale=True):
+    """
+    Aggregate points into a 2D density grid.
+
+    The cost of the returned grid only depends on its pixel count, whatever the number of points.
+
+    Parameters:
+        x (np.ndarray): X coordinates of the points.
+        y (np.ndarray): Y coordinates of the points.
+        x_range (tuple): (min, max) of the x axis.
+        y_range (tuple): (min, max) of the y axis.
+        width (int): Number of bins along the x axis.
+        height (int): Number of bins along the y axis.
+        log_scale (bool): Apply log1p to the counts so dense areas do not hide the others.
+
+    Returns:
+        tuple: (grid of shape (height, width), x bin centers, y bin centers)
+    """
+    # Pad a zero-width extent (e.g. a single sale) so the bins keep a width
+    x_range, y_range = [(low - 0.5, high + 0.5) if low == high else (low, high) for low, high in (x_range, y_range)]
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=(width, height), range=(x_range, y_range))
+    # histogram2d puts x on the first axis, the heatmap expects rows along y
+    grid = counts.T
+    if log_scale:
+        grid = np.log1p(grid)
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+    return grid, x_centers, y_centers
+
+def make_density_figure(df, selected_department, x_range=None, y_range=None, width=300, height=200, log_scale=True):
+    """
+    Build the density heatmap of 'Surface reelle bati' vs 'Valeur fonciere' in a department.
+    Only the aggregated grid is sent to the client. Returns None if no property matches.
+    """
+    filtered_df = df[df['Code departement'].astype(str) == selected_department]
+    if filtered_df.empty:
+        return None
+
+    x = filtered_df['Surface reelle bati'].to_numpy(dtype=float)
+    y = filtered_df['Valeur fonciere'].to_numpy(dtype=float)
+    if x_range is None:
+        x_range = (x.min(), x.max())
+    if y_range is None:
+        y_range = (y.min(), y.max())
+
+    grid, x_centers, y_centers = aggregate_density(x, y, x_range, y_range, width, height, log_scale)
+
+    fig = go.Figure(go.Heatmap(
+        z=grid,
+        x=x_centers,
+        y=y_centers,
+        colorscale='Viridis',
+        colorbar={'title': 'log(1 + count)' if log_scale else 'Count'},
+        hovertemplate='Surface: %{x:.0f} m²<br>Valeur: %{y:.0f} €<br>Density: %{z:.2f}<extra></extra>'
+    ))
+    fig.update_layout(
+        title=f"Density of Surface Reelle Bati vs Valeur Foncière in {selected_department}",
+        xaxis_title='Surface Reelle Bati (m²)',
+        yaxis_title='Valeur Foncière'
+    )
+    return fig
+
+def plot_density(df, selected_department, x_range=None, y_range=None, log_scale=True):
+    """Plot the density heatmap of 'Surface reelle bati' vs 'Valeur fonciere' in the selected department."""
+    fig = make_density_figure(df, selected_department, x_range, y_range, log_scale=log_scale)
+
+    if fig is not None:
+        # Display the heatmap in Streamlit
+        st.plotly_chart(fig)
+
+    else:
+        st.write(f"No data available for Code Departement {selected_department}.")
+
+
+def make_trend_figure(series, selected_department, type_label):
+    """Build the line figure of the median price per square meter over time, with its rolling median and year-over-year delta."""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=series['Date'], y=series['Median Prix_m2'], mode='markers+lines',
+                             name='Median Prix m²'))
+    fig.add_trace(go.Scatter(x=series['Date'], y=series['Rolling Median Prix_m2'], mode='lines',
+                             name='Rolling Median Prix m²'))
+    fig.add_trace(go.Bar(x=series['Date'], y=series['YoY Delta'] * 100, name='YoY Delta (%)',
+                         yaxis='y2', opacity=0.4))
+
+    fig.update_layout(
+        title=f"Median Prix m² of {type_label} in {selected_department}",
+        xaxis_title='Date',
+        yaxis={'title': 'Prix m²'},
+        yaxis2={'title': 'YoY Delta (%)', 'overlaying': 'y', 'side': 'right'},
+        hovermode='x unified'  # Show hover info for all data points along the x-axis
+    )
+    return fig
+
+def plot_trend(series, selected_department, type_label):
+    """Plot the price per square meter trend of the selected department and type."""
+    # Display the plot in Streamlit
+    st.plotly_chart(make_trend_figure(series, selected_department, type_label))
@@ -0,0 +1,351 @@
+#simulate concurrent analysts on one dashboard server and report rerun latency
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.websocket import websocket_connect
+
+# Script served to every simulated session, the same one launched by streamlit
+app_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+# Sections a simulated analyst switches between (the resume has no data to compute)
+sections = ["Data Cleaning Results", "Data Analysis (Plots)", "Valeur Foncière Range Analysis",
+            "Surface vs Price Density", "Comparable Sales", "Prix m² Trends"]
+
+# Widgets a simulated analyst interacts with
+widget_types = ["radio", "selectbox", "slider"]
+
+
+def start_server(port, timeout):
+    """
+    Start one streamlit server running the dashboard and wait until it answers.
+
+    Parameters:
+        port (int): Port the server listens on.
+        timeout (float): Maximum duration of the startup in seconds.
+
+    Returns:
+        subprocess.Popen: The server process.
+    """
+    server = subprocess.Popen([sys.executable, '-m', 'streamlit', 'run', app_script,
+                               '--server.headless', 'true', '--server.port', str(port),
+                               '--browser.gatherUsageStats', 'false'],
+                              cwd=os.path.dirname(app_script))
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"The server exited with code {server.returncode}")
+        try:
+            with urllib.request.urlopen(f'http://localhost:{port}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return server
+        except OSError:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("The server did not start in time")
+
+
+def read_cpu_seconds(pid):
+    """Get the CPU time (user + system) used by a process in seconds."""
+    with open(f'/proc/{pid}/stat') as stat:
+        # The command name may contain spaces, so fields are counted after its closing parenthesis
+        fields = stat.read().rsplit(')', 1)[1].split()
+    # utime and stime are the 14th and 15th fields, the first two are before the parenthesis
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def read_rss(pid):
+    """Get the resident memory of a process in bytes."""
+    with open(f'/proc/{pid}/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+async def sample_peak_rss(pid, stop, peak):
+    """Sample the resident memory of a process until stop is set, keeping the peak in peak[0]."""
+    while not stop.is_set():
+        try:
+            peak[0] = max(peak[0], read_rss(pid))
+        except OSError:
+            return
+        await asyncio.sleep(0.05)
+
+
+class DashboardSession:
+    """
+    One browser-like session connected to the dashboard server through its websocket.
+
+    The session sends the widget states with each rerun request, as the browser does,
+    and reads the elements the script sends back to know the widgets of the page.
+    """
+
+    def __init__(self, port, timeout):
+        """
+        Parameters:
+            port (int): Port of the server.
+            timeout (float): Maximum duration of a rerun in seconds.
+        """
+        self.url = f'ws://localhost:{port}/_stcore/stream'
+        self.timeout = timeout
+        self.connection = None
+        # Widget id -> (container, widget type, proto) of the last rerun
+        self.widgets = {}
+        # Widget id -> WidgetState sent with the next rerun
+        self.states = {}
+
+    async def connect(self):
+        """Open the websocket."""
+        self.connection = await asyncio.wait_for(websocket_connect(self.url, max_message_size=2 ** 30),
+                                                 self.timeout)
+
+    def close(self):
+        """Close the websocket."""
+        if self.connection is not None:
+            self.connection.close()
+
+    async def rerun(self):
+        """
+        Rerun the script with the current widget states and wait for its end.
+
+        Returns:
+            float or None: Latency in seconds, None if the script raised.
+
+        Raises:
+            asyncio.TimeoutError: If the rerun lasts more than the timeout.
+            ConnectionError: If the server closed the connection.
+        """
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.widget_states.widgets.extend(self.states.values())
+
+        start = time.perf_counter()
+        await self.connection.write_message(msg.SerializeToString(), binary=True)
+        widgets = {}
+        failed = False
+        while True:
+            data = await asyncio.wait_for(self.connection.read_message(), self.timeout)
+            if data is None:
+                raise ConnectionError("The server closed the connection")
+            forward_msg = ForwardMsg.FromString(data)
+            msg_type = forward_msg.WhichOneof("type")
+            if msg_type == "delta" and forward_msg.delta.WhichOneof("type") == "new_element":
+                element = forward_msg.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type == "exception":
+                    failed = True
+                elif element_type in widget_types:
+                    # The first index of the path is the root container: 0 main, 1 sidebar
+                    container = "sidebar" if forward_msg.metadata.delta_path[0] == 1 else "main"
+                    proto = getattr(element, element_type)
+                    widgets[proto.id] = (container, element_type, proto)
+            elif msg_type == "script_finished":
+                failed = failed or forward_msg.script_finished != ForwardMsg.FINISHED_SUCCESSFULLY
+                break
+        latency = time.perf_counter() - start
+
+        self.widgets = widgets
+        self.states = {widget_id: state for widget_id, state in self.states.items() if widget_id in widgets}
+        return None if failed else latency
+
+    def find(self, container, widget_type):
+        """Get the (id, proto) of the widgets of a type in a container, in page order."""
+        return [(widget_id, proto) for widget_id, (widget_container, widget_kind, proto) in self.widgets.items()
+                if widget_container == container and widget_kind == widget_type]
+
+    def set_index(self, widget_id, index):
+        """Set the selected option of a radio or selectbox."""
+        self.states[widget_id] = WidgetState(id=widget_id, int_value=index)
+
+    def set_slider(self, widget_id, values):
+        """Set the value (one entry) or range (two entries) of a slider."""
+        state = WidgetState(id=widget_id)
+        state.double_array_value.data.extend(values)
+        self.states[widget_id] = state
+
+    def select_section(self, section):
+        """Select a section in the sidebar navigation."""
+        widget_id, proto = self.find("sidebar", "radio")[0]
+        self.set_index(widget_id, list(proto.options).index(section))
+
+
+def random_slider_values(proto, rng):
+    """Draw a random value or range within the bounds of a slider."""
+    values = sorted(rng.uniform(proto.min, proto.max) for _ in range(len(proto.default)))
+    if proto.data_type == proto.INT:
+        values = [round(value) for value in values]
+    return values
+
+
+async def visit_section(session, rng, record):
+    """
+    Change every radio, selectbox then slider of the current section, one rerun each.
+    The rest of the section is skipped after a failed rerun.
+    """
+    for widget_type in widget_types:
+        i = 0
+        # The widgets are looked up again after each rerun since the page may change
+        while i < len(session.find("main", widget_type)):
+            widget_id, proto = session.find("main", widget_type)[i]
+            i += 1
+            if widget_type == "slider":
+                session.set_slider(widget_id, random_slider_values(proto, rng))
+            elif proto.options:
+                session.set_index(widget_id, rng.randrange(len(proto.options)))
+            else:
+                continue
+            if not record(await session.rerun()):
+                return
+
+
+async def simulate_session(port, steps, timeout, seed):
+    """
+    Simulate one analyst switching sections, columns, departments and slider ranges.
+
+    Parameters:
+        port (int): Port of the server.
+        steps (int): Number of section switches.
+        timeout (float): Maximum duration of a rerun in seconds.
+        seed (int): Seed of the random choices.
+
+    Returns:
+        tuple: (latencies of the successful reruns in seconds, number of failed reruns)
+    """
+    rng = random.Random(seed)
+    latencies = []
+    failures = 0
+
+    def record(latency):
+        nonlocal failures
+        if latency is None:
+            failures += 1
+            return False
+        latencies.append(latency)
+        return True
+
+    session = DashboardSession(port, timeout)
+    await session.connect()
+    try:
+        if not record(await session.rerun()):
+            return latencies, failures
+
+        for _ in range(steps):
+            session.select_section(rng.choice(sections))
+            if not record(await session.rerun()):
+                continue
+
+            await visit_section(session, rng, record)
+    finally:
+        session.close()
+    return latencies, failures
+
+
+async def warm_up(port, timeout):
+    """Visit every section once so the shared caches of the server are filled before measuring."""
+    session = DashboardSession(port, timeout)
+    await session.connect()
+    try:
+        await session.rerun()
+        for section in sections:
+            session.select_section(section)
+            await session.rerun()
+    finally:
+        session.close()
+
+
+async def run_load(server, port, n_sessions, steps, timeout):
+    """
+    Run n concurrent sessions against the server and measure latency, CPU and memory.
+
+    Parameters:
+        server (subprocess.Popen): The server process.
+        port (int): Port of the server.
+        n_sessions (int): Number of concurrent sessions.
+        steps (int): Number of section switches per session.
+        timeout (float): Maximum duration of a rerun in seconds.
+
+    Returns:
+        dict: Statistics of the run.
+    """
+    rss_start = read_rss(server.pid)
+    peak = [rss_start]
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_peak_rss(server.pid, stop, peak))
+
+    cpu_start = read_cpu_seconds(server.pid)
+    wall_start = time.perf_counter()
+    results = await asyncio.gather(*(simulate_session(port, steps, timeout, seed) for seed in range(n_sessions)),
+                                   return_exceptions=True)
+    wall = time.perf_counter() - wall_start
+    cpu = read_cpu_seconds(server.pid) - cpu_start if server.poll() is None else np.nan
+    stop.set()
+    await sampler
+
+    # Sessions that timed out or lost their connection are reported apart from the reruns
+    for result in results:
+        if isinstance(result, BaseException):
+            print(f"Session failed with {n_sessions} concurrent sessions: {result!r}")
+    sessions = [result for result in results if not isinstance(result, BaseException)]
+
+    latencies = np.array([latency for session_latencies, _ in sessions for latency in session_latencies])
+    if len(latencies) > 0:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    else:
+        p50 = p95 = p99 = np.nan
+    return {
+        "sessions": n_sessions,
+        "failed_sessions": n_sessions - len(sessions),
+        "reruns": len(latencies),
+        "failed_reruns": sum(failures for _, failures in sessions),
+        "p50_s": p50,
+        "p95_s": p95,
+        "p99_s": p99,
+        # 100% is one fully used core
+        "server_cpu_percent": 100 * cpu / wall,
+        "server_peak_rss_mb": peak[0] / 2 ** 20,
+        # Memory added on top of the shared dataset and caches, i.e. the cost of the sessions
+        "server_rss_growth_mb": (peak[0] - rss_start) / 2 ** 20,
+        "rss_growth_mb_per_session": (peak[0] - rss_start) / 2 ** 20 / n_sessions,
+    }
+
+
+def main(session_counts, steps, timeout, port, output=None):
+    server = start_server(port, timeout)
+    try:
+        # The cleaning and the indexes are computed once and shared by every session
+        asyncio.run(warm_up(port, timeout))
+
+        rows = []
+        for n in session_counts:
+            if server.poll() is not None:
+                print(f"The server exited with code {server.returncode}, stopping before {n} sessions.")
+                break
+            rows.append(asyncio.run(run_load(server, port, n, steps, timeout)))
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = pd.DataFrame(rows)
+    print(report.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    if output:
+        report.to_csv(output, index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test one dashboard server with concurrent simulated sessions.")
+    parser.add_argument('-n', '--sessions', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help="Numbers of concurrent sessions to test.")
+    parser.add_argument('-s', '--steps', type=int, default=5, help="Number of section switches per session.")
+    parser.add_argument('-t', '--timeout', type=float, default=600, help="Maximum duration of a rerun in seconds.")
+    parser.add_argument('-p', '--port', type=int, default=8599, help="Port of the tested server.")
+    parser.add_argument('-o', '--output', default=None, help="CSV file to write the report to.")
+    args = parser.parse_args()
+    main(args.sessions, args.steps, args.timeout, args.port, args.output)
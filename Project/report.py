@@ -0,0 +1,186 @@
+#render every dashboard figure without the streamlit server
+import argparse
+import importlib.util
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dashboard.dataset_cleaning import cleaning
+from dashboard.trends import TrendStore, trend_frequencies
+from dashboard.visu_generation import (columns_list, land_columns_list,
+                                       prepare_data_for_plotting, get_numerical_columns, get_categorical_columns,
+                                       make_categorical_distribution_figure, make_numerical_distribution_figure,
+                                       make_numerical_vs_valeur_fonciere_figure,
+                                       make_categorical_vs_valeur_fonciere_figure, make_department_map,
+                                       make_valeur_fonciere_range_figure, make_density_figure,
+                                       make_trend_figure, type_local_mapping)
+
+# Datasets and trend stores prepared once in the main process and stored in each worker by init_worker
+datasets = {}
+trend_stores = {}
+
+
+def init_worker(worker_datasets, worker_trend_stores):
+    """Store the cleaned datasets and the trend stores in the worker process."""
+    datasets.update(worker_datasets)
+    trend_stores.update(worker_trend_stores)
+
+
+def list_tasks(df_built, df_sales, stores):
+    """
+    List every figure the dashboard can produce.
+
+    Parameters:
+        df_built (pd.DataFrame): Built properties, used to list the departments of the density views.
+        df_sales (pd.DataFrame): Built properties sold ('Vente'), used to list the departments of the range views.
+        stores (dict): Frequency name -> TrendStore, used to list the trend series.
+
+    Returns:
+        list: List of (view, dataset name, parameter) tuples.
+    """
+    tasks = []
+
+    # Data Cleaning Results: each column of each dataset
+    for name, cols in [("all", columns_list), ("built", columns_list), ("land", land_columns_list)]:
+        tasks += [("distribution", name, col) for col in cols]
+
+    # Data Analysis: each variable against Valeur Foncière, the department map included
+    tasks += [("vs_valeur_fonciere", "built", col) for col in columns_list if col != 'Valeur fonciere']
+
+    # Valeur Foncière Range Analysis: each department with sales over the full range
+    tasks += [("range", "sales", department) for department in sorted(df_sales['Code departement'].unique())]
+
+    # Surface vs Price Density: each department over its full extent
+    departments = sorted(df_built['Code departement'].astype(str).unique())
+    tasks += [("density", "built", department) for department in departments]
+
+    # Prix m² Trends: each department and type at each frequency
+    for frequency, store in stores.items():
+        tasks += [("trend", frequency, (department, type_local))
+                  for department in store.departments() for type_local in store.types(department)]
+    return tasks
+
+
+def build_figure(view, name, param):
+    """Build the figure of a task, as the dashboard would display it."""
+    if view == "trend":
+        department, type_local = param
+        series = trend_stores[name].series(department, type_local)
+        return make_trend_figure(series, department, type_local_mapping.get(type_local, str(type_local)))
+
+    # Plot functions modify their input, so each task works on its own copy
+    df = datasets[name].copy()
+
+    if view == "distribution":
+        if param in get_numerical_columns(df):
+            return make_numerical_distribution_figure(df, param)
+        get_categorical_columns(df)
+        return make_categorical_distribution_figure(df, param)
+
+    if view == "vs_valeur_fonciere":
+        if param in get_numerical_columns(df):
+            return make_numerical_vs_valeur_fonciere_figure(df, param)
+        if param == 'Code departement':
+            return make_department_map(df)
+        get_categorical_columns(df)
+        return make_categorical_vs_valeur_fonciere_figure(df, param)
+
+    if view == "density":
+        return make_density_figure(df, param)
+
+    selected_range = (df['Valeur fonciere'].min(), df['Valeur fonciere'].max())
+    return make_valeur_fonciere_range_figure(df, param, selected_range)
+
+
+def render_task(task, output_dir, formats):
+    """
+    Build the figure of a task and write it in each requested format.
+
+    Parameters:
+        task (tuple): (view, dataset name, parameter) as returned by list_tasks.
+        output_dir (str): Directory to write the files to.
+        formats (list): Output formats among 'html', 'json' and 'png'.
+
+    Returns:
+        list: Paths of the written files.
+    """
+    view, name, param = task
+    fig = build_figure(view, name, param)
+    if fig is None:
+        return []
+
+    if isinstance(param, tuple):
+        param = '_'.join(str(value) for value in param)
+    base = os.path.join(output_dir, f"{view}_{name}_{param}".replace(' ', '_'))
+    paths = []
+    for fmt in formats:
+        path = f"{base}.{fmt}"
+        if hasattr(fig, 'save'):
+            # Folium maps can only be exported as HTML
+            if fmt != 'html':
+                continue
+            fig.save(path)
+        elif fmt == 'html':
+            fig.write_html(path)
+        elif fmt == 'json':
+            fig.write_json(path)
+        elif fmt == 'png':
+            fig.write_image(path)  # requires kaleido, checked in main
+        paths.append(path)
+    return paths
+
+
+def main(filepath, output_dir, formats, workers=None):
+    # Plotly needs kaleido to export PNG, fail before the long cleaning rather than in every task
+    if 'png' in formats and importlib.util.find_spec('kaleido') is None:
+        raise SystemExit("PNG export requires the kaleido package (pip install kaleido).")
+
+    #clean the dataset once, then share it with the workers
+    df_built, df_land, df = cleaning(filepath)
+    df_sales = prepare_data_for_plotting(df_built, columns_list).copy()
+    df_sales['Code departement'] = df_sales['Code departement'].astype(str)
+    worker_datasets = {
+        "all": prepare_data_for_plotting(df, columns_list),
+        "built": prepare_data_for_plotting(df_built, columns_list),
+        "land": prepare_data_for_plotting(df_land, columns_list),
+        "sales": df_sales[df_sales['Nature mutation'] == 'Vente'],
+    }
+
+    stores = {frequency: TrendStore(df_built, frequency) for frequency in trend_frequencies}
+
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = list_tasks(df_built, worker_datasets["sales"], stores)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(worker_datasets, stores)) as executor:
+        futures = {executor.submit(render_task, task, output_dir, formats): task for task in tasks}
+        failed = []
+        skipped = []
+        for future in as_completed(futures):
+            # A failing figure is reported without discarding the rest of the report
+            try:
+                paths = future.result()
+            except Exception as error:
+                failed.append(futures[future])
+                print(f"Failed to render {futures[future]}: {error!r}")
+                continue
+            # No file is written when there is no data or no requested format fits the figure (folium maps are HTML only)
+            if not paths:
+                skipped.append(futures[future])
+                print(f"Skipped {futures[future]}: no data or no supported format")
+            for path in paths:
+                print(path)
+
+    rendered = len(tasks) - len(failed) - len(skipped)
+    print(f"{rendered}/{len(tasks)} tasks rendered, {len(skipped)} skipped, {len(failed)} failed.")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render every dashboard figure to files.")
+    parser.add_argument('filepath', nargs='?', default='data/valeursfoncieres-2022.txt', help="Path to the data file.")
+    parser.add_argument('-o', '--output-dir', default='reports', help="Directory to write the figures to.")
+    parser.add_argument('-f', '--formats', nargs='+', default=['html'], choices=['html', 'json', 'png'],
+                        help="Output formats.")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Number of worker processes.")
+    args = parser.parse_args()
+    main(args.filepath, args.output_dir, args.formats, args.workers)